@@ -1,38 +1,336 @@
 # coding: utf-8
 
 import os
+import bz2
+import hashlib
 import pickle
-from datetime import datetime, timedelta
+import time
+import uuid
+import tempfile
+import threading
+import glob
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import pandas as pd
+from pandas.api.types import union_categoricals
 
-def fetch_daily_quotes(headers, code:str, st:str=None, end:str=None) -> pd.DataFrame:
+# orjson parses quotes much faster if installed.
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# ijson can decode quotes while they are downloaded, which keeps peak memory low for long date ranges
+## but costs several times more CPU than orjson, thus it is used only if STREAM_QUOTES is set to True.
+try:
+    import ijson
+except ImportError:
+    ijson = None
+STREAM_QUOTES = False
+
+TOKEN_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.jquants_token.json')
+ID_TOKEN_LIFETIME = 24 * 60 * 60          # idToken is valid for 24 hours
+REFRESH_TOKEN_LIFETIME = 7 * 24 * 60 * 60 # refreshToken is valid for 1 week
+TOKEN_EXPIRY_MARGIN = 60
+
+_QUOTE_COLS = None # columns of daily quotes, remembered from the last non-empty response
+
+def fetch_daily_quotes(session, code:str, st:str=None, end:str=None) -> pd.DataFrame:
+    global _QUOTE_COLS
     params = {'code': code, 'from':st, 'to':end}
-    r = requests.get("https://api.jquants.com/v1/prices/daily_quotes",params=params, headers=headers)
-    r.raise_for_status()
-    l = r.json()['daily_quotes']
-    df = pd.DataFrame(l)
+    with session.get("https://api.jquants.com/v1/prices/daily_quotes",params=params, stream=True) as r:
+        r.raise_for_status()
+        if not STREAM_QUOTES or ijson is None:
+            # decode error is raised as RequestException like r.json() does, thus callers can fall back on it.
+            try:
+                l = json_loads(r.content)['daily_quotes']
+            except ValueError as e:
+                raise requests.exceptions.InvalidJSONError(e, request=r.request, response=r)
+            # every record has the same keys, thus passing columns skips collecting keys from each record.
+            ## empty response still gets the columns, thus it can be merged with other data.
+            if len(l) > 0:
+                _QUOTE_COLS = tuple(l[0])
+            df = pd.DataFrame.from_records(l, columns=_QUOTE_COLS)
+        else:
+            # decode records one by one and store them column-wise,
+            ## thus neither the whole response body nor a list of dicts is resident.
+            ## body is read by iter_content, thus connection errors are raised as RequestException like r.content.
+            cols = None
+            records = ijson.sendable_list()
+            decoder = ijson.items_coro(records, 'daily_quotes.item', use_float=True)
+
+            def store_records():
+                nonlocal cols
+                for record in records:
+                    if cols is None:
+                        cols = {col: [] for col in record}
+                    for col, values in cols.items():
+                        values.append(record.get(col))
+                del records[:]
+
+            try:
+                for chunk in r.iter_content(chunk_size=64 * 1024):
+                    decoder.send(chunk)
+                    store_records()
+                decoder.close()
+            except ijson.JSONError as e:
+                raise requests.exceptions.InvalidJSONError(e, request=r.request, response=r)
+            store_records()
+            if cols is not None:
+                _QUOTE_COLS = tuple(cols)
+            df = pd.DataFrame(cols, columns=_QUOTE_COLS)
+
+    # parse date once here, thus date comparison and arithmetic don't need to parse strings again.
+    if 'Date' in df.columns:
+        df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d', cache=True)
+    # same code repeats on every row, thus store it as category.
+    if 'Code' in df.columns:
+        df['Code'] = df['Code'].astype('category')
 
     return df
 
-def add_one_day(date_str):
-    return (datetime.strptime(date_str, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y%m%d')
+def get_data_format(data_path):
+    # data format is chosen by file extension, anything else is treated as pickle.
+    ## a directory (or a path ending with a separator) is a parquet dataset, which can be appended to.
+    if data_path.endswith(('/', os.sep)) or os.path.isdir(data_path):
+        return 'parquet_dataset'
+    ext = os.path.splitext(data_path)[1].lower()
+    if ext == '.parquet':
+        return 'parquet'
+    if ext == '.feather':
+        return 'feather'
+    if ext == '.arrow':
+        return 'arrow'
+    return 'pickle'
+
+def open_pickle(data_path, mode):
+    # pickle is compressed if the extension is ".lz4" (fast) or ".bz2" (small).
+    ext = os.path.splitext(data_path)[1].lower()
+    if ext == '.lz4':
+        import lz4.frame
+        return lz4.frame.open(data_path, mode)
+    if ext == '.bz2':
+        return bz2.open(data_path, mode)
+    return open(data_path, mode)
+
+def replace_file(data_path, write):
+    # write to a unique temporary file in the same directory and swap it in,
+    ## thus concurrent writers never share a temporary file and readers never see a partial file.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(data_path) or '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, data_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
 def load_data(load_data_path):
     if os.path.exists(load_data_path):
         # load past data
-        with open(load_data_path, 'rb') as f:
-            df_past = pickle.load(f)
+        data_format = get_data_format(load_data_path)
+        if data_format == 'parquet':
+            df_past = pd.read_parquet(load_data_path, engine='pyarrow')
+        elif data_format == 'parquet_dataset':
+            df_past = read_dataset(load_data_path)
+        elif data_format == 'feather':
+            df_past = pd.read_feather(load_data_path)
+        elif data_format == 'arrow':
+            # uncompressed arrow is memory mapped, thus columns without nulls are served from OS page cache without copy.
+            import pyarrow.feather as feather
+            df_past = feather.read_table(load_data_path, memory_map=True).to_pandas(split_blocks=True)
+        else:
+            with open_pickle(load_data_path, 'rb') as f:
+                df_past = pickle.load(f)
+        # data dumped by older versions stores date as string.
+        if 'Date' in df_past.columns and not pd.api.types.is_datetime64_any_dtype(df_past['Date']):
+            df_past['Date'] = pd.to_datetime(df_past['Date'], format='%Y-%m-%d', cache=True)
     else:
         raise NoFileError(f'Data does not exist at "{load_data_path}". Check if argument "load_data_path" is correct.')
     return df_past
 
+def dump_data(df, dump_data_path):
+    data_format = get_data_format(dump_data_path)
+    if data_format == 'parquet':
+        df.to_parquet(dump_data_path, engine='pyarrow', compression='snappy', index=False)
+        return
+    if data_format == 'feather':
+        # feather only stores a default index.
+        df.reset_index(drop=True).to_feather(dump_data_path, compression='lz4')
+        return
+    if data_format == 'arrow':
+        # loaded data may still map the old file, thus write a new file and swap it in instead of overwriting.
+        replace_file(dump_data_path, lambda tmp_path: df.reset_index(drop=True).to_feather(tmp_path, compression='uncompressed'))
+        return
+    if data_format == 'parquet_dataset':
+        # replace all parts of the dataset with a single part.
+        ## new part is written first, thus old parts are kept if writing fails. other files in the directory are never removed.
+        old_part_paths = list_parts(dump_data_path)
+        write_part(df, dump_data_path)
+        for part_path in old_part_paths:
+            os.remove(part_path)
+        return
+
+    # highest protocol lets pandas hand numpy buffers to pickle without extra copies.
+    ## fall back to default protocol if the object cannot be pickled with it.
+    try:
+        with open_pickle(dump_data_path, 'wb') as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except pickle.PickleError:
+        with open_pickle(dump_data_path, 'wb') as f:
+            pickle.dump(df, f)
+
+def list_parts(dataset_path):
+    # parts are named after their first date, thus sorted paths are in date order.
+    return sorted(glob.glob(os.path.join(dataset_path, 'part-*.parquet')))
+
+def read_dataset_schema(part_paths):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # a column which is null in every row of a part (e.g. prices while trading is halted) has null type,
+    ## thus schemas of all parts are unified to find its actual type.
+    return pa.unify_schemas([pq.read_schema(part_path) for part_path in part_paths])
+
+def read_dataset(dataset_path):
+    import pyarrow.dataset as ds
+
+    part_paths = list_parts(dataset_path)
+    if len(part_paths) == 0:
+        raise NoFileError(f'Data does not exist at "{dataset_path}". Check if argument "load_data_path" is correct.')
+    dataset = ds.dataset(part_paths, schema=read_dataset_schema(part_paths), format='parquet')
+    return dataset.to_table().to_pandas()
+
+def write_part(df, dataset_path, schema=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(dataset_path, exist_ok=True)
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    # empty result (e.g. holidays or a halted code) has no first date and may have no columns at all, thus its part sorts first.
+    if 'Date' in df.columns and df['Date'].notna().any():
+        first_date = pd.Timestamp(df['Date'].min()).strftime('%Y%m%d')
+    else:
+        first_date = '00000000'
+    part_path = os.path.join(dataset_path, f'part-{first_date}-{uuid.uuid4().hex}.parquet')
+    # write under a name which is not a part yet, thus a failed write never leaves a broken part.
+    replace_file(part_path, lambda tmp_path: pq.write_table(table, tmp_path, compression='snappy'))
+    return part_path
+
+def append_data(df, dump_data_path):
+    import pyarrow as pa
+
+    # add df as a new part of the parquet dataset, thus existing rows are never rewritten.
+    ## new part is written with the schema of existing parts, thus all parts can be read together.
+    part_paths = list_parts(dump_data_path)
+    schema = None
+    if len(part_paths) > 0:
+        dataset_schema = read_dataset_schema(part_paths)
+        new_schema = pa.Schema.from_pandas(df, preserve_index=False)
+        fields = []
+        for field in dataset_schema:
+            # column which is null in all existing parts takes the type of new data.
+            if pa.types.is_null(field.type) and field.name in new_schema.names:
+                field = new_schema.field(field.name)
+            fields.append(field)
+        schema = pa.schema(fields, metadata=dataset_schema.metadata)
+    write_part(df, dump_data_path, schema)
+
+def is_same_dataset(load_data_path, dump_data_path):
+    if load_data_path is None or dump_data_path is None:
+        return False
+    if get_data_format(load_data_path) != 'parquet_dataset' or get_data_format(dump_data_path) != 'parquet_dataset':
+        return False
+    return os.path.abspath(load_data_path) == os.path.abspath(dump_data_path)
+
+def load_token_cache(token_cache_path):
+    try:
+        with open(token_cache_path, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    if not isinstance(cache, dict):
+        cache = {}
+    return cache
+
+def dump_token_cache(token_cache_path, cache):
+    # write to a unique temporary file first and swap it in,
+    ## thus a crash never leaves a truncated cache and parallel processes never share a temporary file.
+    ## caching is best effort, thus failure to write (e.g. read-only home) is ignored.
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(token_cache_path) or '.', suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, token_cache_path)
+    except OSError:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def is_token_fresh(cache, key):
+    return time.time() < cache.get(key, 0) - TOKEN_EXPIRY_MARGIN
+
 def check_df_range(df):
     first = df['Date'].min()
     last  = df['Date'].max()
     return first, last
 
+def merge_data(dfs):
+    # empty frames are skipped, thus they never turn columns of merged data into object dtype.
+    non_empty = [df for df in dfs if len(df) > 0]
+    if len(non_empty) == 0:
+        non_empty = dfs[:1]
+    # concat keeps category dtype only if categories are identical, thus unify categories of Code first.
+    ## shards usually share the same dtype already, and then they are passed to concat as they are.
+    if all('Code' in df.columns for df in non_empty) \
+            and any(isinstance(df['Code'].dtype, pd.CategoricalDtype) for df in non_empty) \
+            and len({df['Code'].dtype for df in non_empty}) > 1:
+        categories = union_categoricals([df['Code'].astype('category') for df in non_empty]).categories
+        code_dtype = pd.CategoricalDtype(categories)
+        non_empty = [df.assign(Code=df['Code'].astype(code_dtype)) for df in non_empty]
+    # single concat is kept on purpose: column-wise np.concatenate + DataFrame(dict) was measured not faster (blocks are consolidated again).
+    return pd.concat(non_empty, ignore_index=True)
+
+def check_parquet_range(data_path):
+    """Read first & last date from parquet row group statistics without loading data.
+
+    Returns None if data is not parquet or statistics are unavailable.
+    """
+    data_format = get_data_format(data_path)
+    if data_format == 'parquet' and os.path.isfile(data_path):
+        part_paths = [data_path]
+    elif data_format == 'parquet_dataset':
+        part_paths = list_parts(data_path)
+    else:
+        return None
+
+    import pyarrow.parquet as pq
+
+    mins = []
+    maxs = []
+    for part_path in part_paths:
+        metadata = pq.ParquetFile(part_path).metadata
+        # empty part has no date to check.
+        if metadata.num_rows == 0:
+            continue
+        if 'Date' not in metadata.schema.names:
+            return None
+        col_idx = metadata.schema.names.index('Date')
+        for i in range(metadata.num_row_groups):
+            stats = metadata.row_group(i).column(col_idx).statistics
+            if stats is None or not stats.has_min_max:
+                return None
+            mins.append(pd.Timestamp(stats.min))
+            maxs.append(pd.Timestamp(stats.max))
+    if len(mins) == 0:
+        return None
+    return min(mins), max(maxs)
+
 
 class NoFileError(Exception):
     def __init__(self, msg):
@@ -43,27 +341,112 @@ class NoFileError(Exception):
 
 
 class myjquants():
-    def __init__(self, mailaddress:str, password:str):
+    # authenticated (session, headers, idToken expiry) shared by instances in the same process, keyed by hash of access key.
+    _session_cache = {}
+    # sessions are shared, thus a rejected idToken is replaced by one instance at a time.
+    _auth_lock = threading.Lock()
+
+    def __init__(self, mailaddress:str, password:str, token_cache_path:str=TOKEN_CACHE_PATH):
         """Generate access token from access key(mailaddress and password), and stores it in headers.
 
+        Instances with the same access key share one authenticated session while its idToken is fresh.
+        Tokens are also cached in token_cache_path, thus a fresh idToken skips both auth requests
+        and a fresh refreshToken skips the auth_user request. idToken rejected with 401 is
+        dropped from both caches and quotes are requested once again with a new one.
+
         Attributes
         ----------
         headers : str
             access key -- mail address
         password    : str
             access key -- password
+        token_cache_path : str
+            Path of the token cache file. If null, tokens will not be cached. (e.g. '~/.jquants_token.json')
         """
 
-        data={"mailaddress":mailaddress, "password":password}
-        r_post = requests.post("https://api.jquants.com/v1/token/auth_user", data=json.dumps(data))
+        self._mailaddress = mailaddress
+        self._password = password
+        self._token_cache_path = token_cache_path
+        self._key = hashlib.sha256(f'{mailaddress}:{password}'.encode()).hexdigest()
 
-        REFRESH_TOKEN = r_post.json()['refreshToken']
-        r_post = requests.post(f"https://api.jquants.com/v1/token/auth_refresh?refreshtoken={REFRESH_TOKEN}")
+        cached = myjquants._session_cache.get(self._key)
+        if cached is not None and time.time() < cached[2] - TOKEN_EXPIRY_MARGIN:
+            self.session, self.headers, _ = cached
+            return
+
+        # reuse one connection for auth and all subsequent quote requests.
+        ## quote requests are retried with backoff on rate limit and server errors.
+        session = requests.Session()
+        retry = Retry(total=5, backoff_factor=0.4, status_forcelist={429, 500, 502, 503, 504}, allowed_methods={'GET'})
+        session.mount('https://', HTTPAdapter(max_retries=retry))
+        self.session = session
+
+        self._authenticate()
+
+    def _authenticate(self, reject_id_token:bool=False):
+        """Set idToken to the session, using cached tokens if they are fresh.
+
+        If reject_id_token is True, cached idToken has been rejected by the server and is not used again.
+        """
+        session = self.session
+        token_cache_path = self._token_cache_path
+
+        # cache is used only for the same access key, thus a wrong password never authenticates from cache.
+        cache = load_token_cache(token_cache_path) if token_cache_path is not None else {}
+        if cache.get('credential') != self._key:
+            cache = {'credential': self._key}
+        if reject_id_token:
+            cache.pop('idToken', None)
+            cache.pop('idTokenExp', None)
+            myjquants._session_cache.pop(self._key, None)
+
+        if is_token_fresh(cache, 'idTokenExp'):
+            idToken = cache['idToken']
+        else:
+            idToken = None
+            if is_token_fresh(cache, 'refreshTokenExp'):
+                r_post = session.post(f"https://api.jquants.com/v1/token/auth_refresh?refreshtoken={cache['refreshToken']}")
+                idToken = r_post.json().get('idToken')
+
+            # cached refresh token is missing, expired or revoked.
+            if idToken is None:
+                data={"mailaddress":self._mailaddress, "password":self._password}
+                r_post = session.post("https://api.jquants.com/v1/token/auth_user", data=json.dumps(data))
+
+                REFRESH_TOKEN = r_post.json()['refreshToken']
+                cache['refreshToken'] = REFRESH_TOKEN
+                cache['refreshTokenExp'] = time.time() + REFRESH_TOKEN_LIFETIME
+                r_post = session.post(f"https://api.jquants.com/v1/token/auth_refresh?refreshtoken={REFRESH_TOKEN}")
+
+                idToken = r_post.json()['idToken']
+
+            cache['idToken'] = idToken
+            cache['idTokenExp'] = time.time() + ID_TOKEN_LIFETIME
+            if token_cache_path is not None:
+                dump_token_cache(token_cache_path, cache)
 
-        idToken = r_post.json()['idToken']
         headers = {'Authorization': 'Bearer {}'.format(idToken)}
+        session.headers.update(headers)
         
         self.headers = headers
+        myjquants._session_cache[self._key] = (session, headers, cache['idTokenExp'])
+
+    def fetch_quotes(self, code:str, st:str=None, end:str=None) -> pd.DataFrame:
+        """Fetch daily quotes, authenticating again once if idToken is rejected (e.g. revoked)."""
+        authorization = self.session.headers.get('Authorization')
+        try:
+            return fetch_daily_quotes(self.session, code, st, end)
+        except requests.exceptions.HTTPError as e:
+            if e.response is None or e.response.status_code != 401:
+                raise
+
+        with myjquants._auth_lock:
+            # the other window or instance sharing the session may have authenticated again already.
+            if self.session.headers.get('Authorization') == authorization:
+                self._authenticate(reject_id_token=True)
+            else:
+                self.headers = {'Authorization': self.session.headers['Authorization']}
+        return fetch_daily_quotes(self.session, code, st, end)
     
     def save_quotes(self, code:str, st:str=None, end:str=None,
                     load_data_path:str=None, dump_data_path:str=None) -> pd.DataFrame:
@@ -78,21 +461,34 @@ class myjquants():
         end : str
             Download end date (e.g. '20240503')
         load_data_path : str
-            Path of past data. Data must be dumped using pickle.
+            Path of past data. Data must be dumped using pickle, parquet if the extension is ".parquet",
+            feather if the extension is ".feather", memory mapped arrow if the extension is ".arrow",
+            or parquet dataset if the path is a directory.
+            Pickle is compressed if the extension is ".lz4" or ".bz2". (e.g. './load_data.pickle.lz4')
             If null, past data will not be used. (e.g. './load_data.pickle')
         dump_data_path : str
-            Path where to dump created data. Data will be dumped using pickle.
+            Path where to dump created data. Data will be dumped using pickle, parquet if the extension is ".parquet",
+            feather if the extension is ".feather", uncompressed arrow if the extension is ".arrow",
+            or parquet dataset if the path is a directory (e.g. './dump_data/').
+            If it is the same dataset as load_data_path, only newly downloaded data is appended.
+            Pickle is compressed if the extension is ".lz4" or ".bz2". (e.g. './dump_data.pickle.lz4')
             If null, dump data will not be created. (e.g. './dump_data.pickle')
 
         Returns
         -------
         df : pandas.DataFrame
-            Merged data of past downloaded data and downloaded data.
+            Merged data of past downloaded data and downloaded data. "Date" column is datetime64.
         """
         # load data and check first & last date of loaded data.
+        ## if parquet statistics hold the date range, loading data is deferred until it's merged.
         if load_data_path is not None:
-            df_past = load_data(load_data_path)
-            first, last = check_df_range(df_past)
+            df_past = None
+            data_range = check_parquet_range(load_data_path)
+            if data_range is None:
+                df_past = load_data(load_data_path)
+                first, last = check_df_range(df_past)
+            else:
+                first, last = data_range
         
         # download data via jquants api.
         ## if load_data_path is defined, download only undownloaded data and merge with past downloaded data.
@@ -101,34 +497,49 @@ class myjquants():
             after_past_data  = {}
             
             before_past_data['st'] = st
-            before_past_data['end'] = first
+            before_past_data['end'] = first.strftime('%Y%m%d')
             
-            after_past_data['st'] = last
+            after_past_data['st'] = last.strftime('%Y%m%d')
             after_past_data['end'] = end
             
-            try:
-                df_before = fetch_daily_quotes(self.headers, code, before_past_data['st'], before_past_data['end'])
-            except requests.exceptions.RequestException as e:
-                df_before = pd.DataFrame(columns=df_past.columns)
-            else:
-                df_before = df_before.drop(df_before.index[-1]) # delete last data, thus there are duplicates between df_before and df_past
+            # skip the window which past data already covers, thus no request is made when it covers the whole period.
+            need_before = st is None or pd.Timestamp(st) < first
+            need_after  = end is None or pd.Timestamp(end) > last
+            
+            # both windows are independent, so request them concurrently over the shared session.
+            ## at most two requests are in flight, so threads are enough; an event loop (asyncio/aiohttp) would add a dependency without saving a round trip.
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                future_before = executor.submit(self.fetch_quotes, code, before_past_data['st'], before_past_data['end']) if need_before else None
+                future_after  = executor.submit(self.fetch_quotes, code, after_past_data['st'], after_past_data['end']) if need_after else None
+                # read deferred past data while the requests are in flight.
+                if df_past is None:
+                    df_past = load_data(load_data_path)
             
+            df_before = df_past.iloc[:0]
+            df_after  = df_past.iloc[:0]
+            # transient errors are already retried in the session, thus only a terminal failure reaches here and past data is kept as it is.
             try:
-                df_after = fetch_daily_quotes(self.headers, code, after_past_data['st'], after_past_data['end'])
+                if future_before is not None:
+                    df_before = future_before.result().iloc[:-1] # delete last data, thus there are duplicates between df_before and df_past
+                if future_after is not None:
+                    df_after  = future_after.result().iloc[1:]   # delete first data, thus there are duplicates between df_after  and df_past
             except requests.exceptions.RequestException as e:
-                df_before = pd.DataFrame(columns=df_past.columns)
-            else:
-                df_after = df_after.drop(df_after.index[0]) # delete first data, thus there are duplicates between df_after  and df_past
+                df_before = df_past.iloc[:0]
+                df_after  = df_past.iloc[:0]
             
-            df = pd.concat([df_before,df_past,df_after], ignore_index=True)
+            df = merge_data([df_before,df_past,df_after])
         
         ## if load_data_path is not defined, simply download data from jquants api.
         else:
-            df = fetch_daily_quotes(self.headers, code, st, end)
+            df = self.fetch_quotes(code, st, end)
         
-        # Pickle data
-        if dump_data_path is not None:
-            with open(dump_data_path, 'wb') as f:
-                pickle.dump(df, f)
+        # Dump data
+        ## if past data is loaded from the same parquet dataset, append only newly downloaded data.
+        if is_same_dataset(load_data_path, dump_data_path):
+            for df_new in (df_before, df_after):
+                if len(df_new) > 0:
+                    append_data(df_new, dump_data_path)
+        elif dump_data_path is not None:
+            dump_data(df, dump_data_path)
             
         return df
@@ -0,0 +1,330 @@
+# coding: utf-8
+
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+import jquants_downloader as jd
+
+
+CODE = '27800'
+DATES = pd.bdate_range('2024-01-01', periods=40)
+# trading is halted on the last days, thus the after window of the last update has null prices only.
+HALT_FROM = DATES[34]
+
+
+def make_quotes():
+    quotes = []
+    for i, date in enumerate(DATES):
+        price = None if date >= HALT_FROM else 100.0 + i
+        quotes.append({'Date': date.strftime('%Y-%m-%d'), 'Code': CODE,
+                       'Open': price, 'Close': price, 'Volume': 1000.0 + i,
+                       'UpperLimit': '0'})
+    return quotes
+
+
+class FakeJQuants(BaseHTTPRequestHandler):
+    """Serve the JQuants endpoints used by jquants_downloader from memory.
+
+    State of the server is kept in the server object, thus tests can change it between requests.
+    """
+
+    def do_POST(self):
+        self.do_GET()
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        server.calls.append(url.path)
+        if url.path.endswith('/token/auth_user'):
+            return self.respond(200, {'refreshToken': 'refresh-token'})
+        if url.path.endswith('/token/auth_refresh'):
+            return self.respond(200, {'idToken': 'id-token'})
+
+        if self.headers.get('Authorization', '').split(' ')[-1] in server.revoked:
+            return self.respond(401, {'message': 'The incoming token is invalid or expired.'})
+        if server.unavailable > 0:
+            server.unavailable -= 1
+            return self.respond(503, {'message': 'Service Unavailable'})
+
+        query = parse_qs(url.query)
+        st = pd.Timestamp(query['from'][0]) if 'from' in query else DATES[0]
+        end = pd.Timestamp(query['to'][0]) if 'to' in query else DATES[-1]
+        quotes = [q for q in server.quotes if st <= pd.Timestamp(q['Date']) <= end]
+        body = json.dumps({'daily_quotes': quotes}).encode()
+        if server.failure == 'reset':
+            # connection is closed in the middle of the body.
+            return self.respond(200, body=body, length=len(body) * 2)
+        if server.failure == 'truncated':
+            body = body[:len(body) // 2]
+        if server.failure == 'garbled':
+            body = b'<html>Bad Gateway</html>'
+        return self.respond(200, body=body)
+
+    def respond(self, status, data=None, body=None, length=None):
+        if body is None:
+            body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(length if length is not None else len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalAdapter(HTTPAdapter):
+    """Send requests for the JQuants API to the local server, through the retry setup of jquants_downloader."""
+
+    def __init__(self, base_url, **kwargs):
+        self.base_url = base_url
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        request.url = request.url.replace('https://api.jquants.com', self.base_url, 1)
+        return super().send(request, **kwargs)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeJQuants)
+    server.daemon_threads = True
+    server.quotes = make_quotes()
+    server.calls = []
+    server.failure = None # None, 'reset', 'truncated' or 'garbled'
+    server.revoked = set() # idTokens answered with 401
+    server.unavailable = 0 # number of following quote requests answered with 503
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True)
+    thread.start()
+
+    base_url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+    monkeypatch.setattr(jd, 'HTTPAdapter', lambda max_retries: LocalAdapter(base_url, max_retries=max_retries))
+    monkeypatch.setattr(jd.myjquants, '_session_cache', {})
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=['ijson', 'buffered'])
+def client(request, server, monkeypatch, tmp_path):
+    if request.param == 'ijson':
+        if jd.ijson is None:
+            pytest.skip('ijson is not installed')
+        monkeypatch.setattr(jd, 'STREAM_QUOTES', True)
+    return jd.myjquants('user@example.com', 'password', token_cache_path=str(tmp_path / 'token.json'))
+
+
+def ymd(i):
+    return DATES[i].strftime('%Y%m%d')
+
+
+@pytest.mark.parametrize('data_name', [
+    'data.pickle', 'data.pickle.bz2', 'data.parquet', 'data.feather', 'data.arrow', 'dataset/',
+])
+def test_save_quotes_round_trip(client, tmp_path, data_name):
+    pytest.importorskip('pyarrow')
+    data_path = os.path.join(str(tmp_path), data_name)
+
+    client.save_quotes(CODE, ymd(10), ymd(20), dump_data_path=data_path)
+    client.save_quotes(CODE, ymd(5), ymd(25), load_data_path=data_path, dump_data_path=data_path)
+    client.save_quotes(CODE, ymd(0), ymd(35), load_data_path=data_path, dump_data_path=data_path)
+    df = client.save_quotes(CODE, None, ymd(39), load_data_path=data_path, dump_data_path=data_path)
+
+    expected = pd.DatetimeIndex(DATES[0:40])
+    assert list(df['Date']) == list(expected)
+    loaded = jd.load_data(data_path)
+    assert list(loaded['Date']) == list(expected)
+    assert list(loaded['Volume']) == [1000.0 + i for i in range(40)]
+    assert loaded['Close'].iloc[34:].isna().all()
+    assert list(loaded['Close'].iloc[:34]) == [100.0 + i for i in range(34)]
+
+
+@pytest.mark.parametrize('quote_cols', [None, ('Date', 'Code', 'Close')])
+def test_save_quotes_dumps_empty_window_to_dataset(client, tmp_path, monkeypatch, quote_cols):
+    pytest.importorskip('pyarrow')
+    # weekend has no quotes. columns are unknown if no response with rows is seen yet.
+    monkeypatch.setattr(jd, '_QUOTE_COLS', quote_cols)
+    data_path = os.path.join(str(tmp_path), 'dataset/')
+
+    df = client.save_quotes(CODE, '20240106', '20240107', dump_data_path=data_path)
+
+    assert len(df) == 0
+    assert len(jd.list_parts(data_path)) == 1
+    assert len(jd.load_data(data_path)) == 0
+
+
+def test_save_quotes_skips_covered_window(client, server, tmp_path):
+    data_path = str(tmp_path / 'data.pickle')
+    client.save_quotes(CODE, ymd(0), ymd(20), dump_data_path=data_path)
+    del server.calls[:]
+
+    df = client.save_quotes(CODE, ymd(5), ymd(15), load_data_path=data_path)
+
+    assert server.calls == []
+    assert len(df) == 21
+
+
+@pytest.mark.parametrize('failure', ['reset', 'truncated', 'garbled'])
+def test_save_quotes_keeps_past_data_on_broken_response(client, server, tmp_path, failure):
+    data_path = str(tmp_path / 'data.pickle')
+    df_past = client.save_quotes(CODE, ymd(10), ymd(20), dump_data_path=data_path)
+
+    server.failure = failure
+    df = client.save_quotes(CODE, ymd(5), ymd(25), load_data_path=data_path)
+
+    assert list(df['Date']) == list(df_past['Date'])
+
+
+def test_fetch_daily_quotes_retries_unavailable(client, server):
+    server.unavailable = 1
+    df = jd.fetch_daily_quotes(client.session, CODE, ymd(0), ymd(10))
+
+    assert len(df) == 11
+    assert server.calls.count('/v1/prices/daily_quotes') == 2
+
+
+def test_save_quotes_keeps_past_data_when_retries_are_exhausted(client, server, tmp_path, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(jd.Retry, 'sleep', lambda self, response=None: sleeps.append(self.get_backoff_time()))
+    data_path = str(tmp_path / 'data.pickle')
+    df_past = client.save_quotes(CODE, ymd(10), ymd(20), dump_data_path=data_path)
+    del server.calls[:]
+
+    server.unavailable = 100
+    df = client.save_quotes(CODE, ymd(5), ymd(25), load_data_path=data_path)
+
+    assert list(df['Date']) == list(df_past['Date'])
+    # both windows are requested once and retried 5 times with exponential backoff.
+    assert server.calls.count('/v1/prices/daily_quotes') == 12
+    assert sorted(sleeps) == sorted([0, 0.8, 1.6, 3.2, 6.4] * 2)
+
+
+@pytest.mark.parametrize('failure', ['reset', 'truncated', 'garbled'])
+def test_fetch_daily_quotes_raises_request_exception(client, server, failure):
+    server.failure = failure
+    with pytest.raises(requests.exceptions.RequestException):
+        jd.fetch_daily_quotes(client.session, CODE, ymd(0), ymd(10))
+
+
+def test_dump_dataset_keeps_other_files(tmp_path):
+    pytest.importorskip('pyarrow')
+    other_path = tmp_path / 'other.parquet'
+    pd.DataFrame({'a': [1]}).to_parquet(other_path)
+    df = pd.DataFrame({'Date': DATES[:3], 'Close': [1.0, 2.0, 3.0]})
+
+    jd.dump_data(df, str(tmp_path) + os.sep)
+    jd.dump_data(df, str(tmp_path) + os.sep)
+
+    assert other_path.exists()
+    assert len(jd.list_parts(str(tmp_path))) == 1
+
+
+def test_dump_data_leaves_no_temporary_file(tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    data_path = str(tmp_path / 'data.arrow')
+    df = pd.DataFrame({'Date': DATES[:3], 'Close': [1.0, 2.0, 3.0]})
+    jd.dump_data(df, data_path)
+
+    def broken_to_feather(self, path, **kwargs):
+        open(path, 'wb').write(b'partial')
+        raise OSError('disk full')
+    monkeypatch.setattr(pd.DataFrame, 'to_feather', broken_to_feather)
+    with pytest.raises(OSError):
+        jd.dump_data(df, data_path)
+
+    assert os.listdir(str(tmp_path)) == ['data.arrow']
+    assert list(jd.load_data(data_path)['Close']) == [1.0, 2.0, 3.0]
+
+
+def test_append_data_keeps_dataset_schema(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    dataset_path = str(tmp_path) + os.sep
+    halted = pd.DataFrame({'Date': DATES[:2], 'Close': [None, None]}, dtype=object).astype({'Date': DATES.dtype})
+    traded = pd.DataFrame({'Date': DATES[2:5], 'Close': [1.0, 2.0, 3.0]})
+
+    # all null part is appended to a dataset of prices, and vice versa (then the first part has null type).
+    jd.dump_data(traded, dataset_path)
+    jd.append_data(halted, dataset_path)
+    assert [str(pq.read_schema(part).field('Close').type) for part in jd.list_parts(dataset_path)] == ['double', 'double']
+
+    jd.dump_data(halted, dataset_path)
+    jd.append_data(traded, dataset_path)
+    loaded = jd.load_data(dataset_path)
+    assert list(loaded['Date']) == list(DATES[:5])
+    assert loaded['Close'].iloc[:2].isna().all()
+    assert list(loaded['Close'].iloc[2:]) == [1.0, 2.0, 3.0]
+
+
+def test_token_cache_skips_auth(server, tmp_path):
+    token_cache_path = str(tmp_path / 'token.json')
+    jd.myjquants('user@example.com', 'password', token_cache_path=token_cache_path)
+    assert len(server.calls) == 2
+
+    jd.myjquants._session_cache.clear()
+    client = jd.myjquants('user@example.com', 'password', token_cache_path=token_cache_path)
+    assert len(server.calls) == 2
+    assert client.headers == {'Authorization': 'Bearer id-token'}
+
+
+def test_token_cache_is_not_used_with_wrong_password(server, tmp_path):
+    token_cache_path = str(tmp_path / 'token.json')
+    jd.myjquants('user@example.com', 'password', token_cache_path=token_cache_path)
+
+    jd.myjquants._session_cache.clear()
+    jd.myjquants('user@example.com', 'wrong-password', token_cache_path=token_cache_path)
+    assert server.calls.count('/v1/token/auth_user') == 2
+
+
+def test_save_quotes_authenticates_again_on_revoked_token(server, tmp_path):
+    token_cache_path = str(tmp_path / 'token.json')
+    client = jd.myjquants('user@example.com', 'password', token_cache_path=token_cache_path)
+    cache = jd.load_token_cache(token_cache_path)
+    cache['idToken'] = 'revoked-token'
+    jd.dump_token_cache(token_cache_path, cache)
+    server.revoked.add('revoked-token')
+    jd.myjquants._session_cache.clear()
+
+    client = jd.myjquants('user@example.com', 'password', token_cache_path=token_cache_path)
+    assert client.headers == {'Authorization': 'Bearer revoked-token'}
+    df = client.save_quotes(CODE, ymd(0), ymd(10))
+
+    assert len(df) == 11
+    assert client.headers == {'Authorization': 'Bearer id-token'}
+    assert jd.load_token_cache(token_cache_path)['idToken'] == 'id-token'
+    assert jd.myjquants._session_cache[client._key][1] == client.headers
+
+
+def test_token_cache_ignores_unwritable_path(server, tmp_path):
+    token_cache_path = str(tmp_path / 'missing' / 'token.json')
+    client = jd.myjquants('user@example.com', 'password', token_cache_path=token_cache_path)
+    assert client.headers == {'Authorization': 'Bearer id-token'}
+
+
+def test_token_cache_ignores_non_dict(tmp_path):
+    token_cache_path = tmp_path / 'token.json'
+    token_cache_path.write_text('[]')
+    assert jd.load_token_cache(str(token_cache_path)) == {}
+
+
+def test_session_is_shared_across_instances(server, tmp_path):
+    a = jd.myjquants('user@example.com', 'password', token_cache_path=None)
+    b = jd.myjquants('user@example.com', 'password', token_cache_path=None)
+    assert a.session is b.session
+    assert len(server.calls) == 2
+
+
+def test_merge_data_unifies_code_categories():
+    a = pd.DataFrame({'Code': pd.Categorical(['1', '1'])})
+    b = pd.DataFrame({'Code': pd.Categorical(['2'])})
+    c = pd.DataFrame({'Code': ['3']})
+    df = jd.merge_data([a, b, c])
+    assert isinstance(df['Code'].dtype, pd.CategoricalDtype)
+    assert list(df['Code']) == ['1', '1', '2', '3']